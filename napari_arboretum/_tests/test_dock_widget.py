@@ -1,6 +1,7 @@
+import numpy as np
 import pytest
 
-from napari_arboretum import napari_experimental_provide_dock_widget
+from napari_arboretum import Arboretum, napari_experimental_provide_dock_widget
 
 # this is your plugin name declared in your napari.plugins entry point
 MY_PLUGIN_NAME = "napari-arboretum"
@@ -16,3 +17,115 @@ MY_WIDGET_NAMES = ["Arboretum"]
 #         plugin_name=MY_PLUGIN_NAME, widget_name=widget_name
 #     )
 #     assert len(viewer.window._dock_widgets) == num_dw + 1
+
+
+def _make_tracks(n_generations: int, first_id: int = 0):
+    """Make the track data and graph of a binary lineage tree."""
+    data, graph = [], {}
+    queue = [(first_id, 0, 1)]
+    next_id = first_id + 1
+    while queue:
+        track_id, t, generation = queue.pop(0)
+        data += [[track_id, t, 0, 0], [track_id, t + 1, 0, 0]]
+        if generation < n_generations:
+            for _ in range(2):
+                graph[next_id] = [track_id]
+                queue.append((next_id, t + 2, generation + 1))
+                next_id += 1
+    return data, graph
+
+
+@pytest.fixture
+def tracks_viewer(make_napari_viewer):
+    """A viewer with a large (5 generation) and a small (2 generation) tree."""
+    large_data, large_graph = _make_tracks(5)
+    small_data, small_graph = _make_tracks(2, first_id=100)
+    data = np.array(large_data + small_data, dtype=float)
+
+    viewer = make_napari_viewer()
+    layer = viewer.add_tracks(data, graph={**large_graph, **small_graph})
+    widget = Arboretum(viewer)
+    return viewer, layer, widget
+
+
+def _click_track(layer, track_id):
+    """Simulate selecting a track with the mouse."""
+    layer.get_value = lambda *args, **kwargs: track_id
+    show_tree = layer.mouse_drag_callbacks[-1]
+    show_tree(layer, None)
+
+
+def test_draw_graph_hides_surplus_items(tracks_viewer):
+    """Test that drawing a small tree after a large one hides the surplus
+    pooled edge curves and text items."""
+    _, layer, widget = tracks_viewer
+
+    _, edges, annotations = widget._layout(layer, 0)
+    widget.draw_graph(0, edges, annotations)
+    n_curves = len(widget._edge_pool)
+    n_text = len(widget._text_pool)
+    assert n_text == len(annotations)
+
+    _, edges, annotations = widget._layout(layer, 100)
+    widget.draw_graph(100, edges, annotations)
+
+    # the pools are reused, rather than recreated
+    assert len(widget._edge_pool) == n_curves
+    assert len(widget._text_pool) == n_text
+
+    # one curve per edge color, the surplus items are hidden
+    n_colors = len(
+        {ec if isinstance(ec, str) else tuple(ec) for *_, ec in edges}
+    )
+    visible_curves = [c for c in widget._edge_pool if c.isVisible()]
+    visible_text = [t for t in widget._text_pool if t.isVisible()]
+    assert len(visible_curves) == n_colors < n_curves
+    assert len(visible_text) == len(annotations) < n_text
+
+    # the view range is set from the extent of the edges
+    (x_min, x_max), (y_min, y_max) = widget.plot_view.viewRange()
+    ex = np.concatenate([e[0] for e in edges])
+    ey = np.concatenate([e[1] for e in edges])
+    assert x_min <= ex.min() and ex.max() <= x_max
+    assert y_min <= ey.min() and ey.max() <= y_max
+
+
+def test_layout_cache(tracks_viewer):
+    """Test that the layouts are cached, and cleared when the graph or data of
+    the layer change."""
+    _, layer, widget = tracks_viewer
+
+    layout = widget._layout(layer, 0)
+    assert widget._layout(layer, 0) is layout
+
+    graph = layer.graph
+    layer.graph = {k: v for k, v in graph.items() if v != [0]}
+    assert not widget._layouts
+    assert widget._layout(layer, 0)[1] == []
+
+    layer.graph = graph
+    widget._layout(layer, 0)
+    layer.data = layer.data + [0, 100, 0, 0]
+    assert not widget._layouts
+
+
+def test_show_tree_skips_redraw(tracks_viewer, monkeypatch):
+    """Test that selecting the same track again does not redraw the tree,
+    unless the layer has changed."""
+    _, layer, widget = tracks_viewer
+
+    drawn = []
+    monkeypatch.setattr(widget, "draw_graph", lambda *args: drawn.append(args))
+
+    _click_track(layer, 0)
+    _click_track(layer, 0)
+    assert len(drawn) == 1
+
+    _click_track(layer, 100)
+    assert len(drawn) == 2
+
+    graph = layer.graph
+    layer.graph = graph
+    assert widget._selected is None
+    _click_track(layer, 100)
+    assert len(drawn) == 3
@@ -48,3 +48,42 @@ def test_node_is_leaf():
     """Test the `TreeNode` class."""
     node = graph.TreeNode()
     assert node.is_leaf()
+
+
+def test_track_time_extents():
+    """Test finding the first and last time point of each track."""
+    data = np.array(
+        [
+            [2, 4, 0, 0],
+            [1, 1, 0, 0],
+            [2, 3, 0, 0],
+            [1, 0, 0, 0],
+            [1, 2, 0, 0],
+            [3, 5, 0, 0],
+        ]
+    )
+    track_ids, t_start, t_end = graph.track_time_extents(data)
+    np.testing.assert_equal(track_ids, [1, 2, 3])
+    np.testing.assert_equal(t_start, [0, 3, 5])
+    np.testing.assert_equal(t_end, [2, 4, 5])
+
+
+def test_build_subgraph_time_extents():
+    """Test that the subgraph nodes have the correct time extents when the
+    layer also contains tracks outside of the subtree."""
+    rows = []
+    for track_id in range(max(TEST_GRAPH_LINEAR) + 1):
+        for t in range(track_id, 2 * track_id + 2):
+            rows.append([track_id, t, 0, 0])
+
+    # add an unrelated track, and a separate tree, which are not in the subtree
+    rows += [[10, 0, 0, 0], [10, 20, 0, 0], [11, 5, 0, 0], [12, 6, 0, 0]]
+    data = np.random.default_rng(0).permutation(np.array(rows, dtype=float))
+
+    tracks = Tracks(data, graph={**TEST_GRAPH, 12: [11]})
+    root, nodes = graph.build_subgraph(tracks, TEST_GRAPH_ROOT)
+
+    assert root == TEST_GRAPH_ROOT
+    assert [node.ID for node in nodes] == TEST_GRAPH_LINEAR
+    for node in nodes:
+        assert node.t == (node.ID, 2 * node.ID + 1)
@@ -10,6 +10,8 @@
 # Created:  01/05/2020
 # ------------------------------------------------------------------------------
 
+from collections import deque
+
 import numpy as np
 
 from .tree import _build_tree
@@ -84,10 +86,10 @@ def linearise_tree(graph: dict, root: int) -> list:
     linear : list
         A linearised tree, with only the node ID of each node of the tree.
     """
-    queue = [root]
+    queue = deque([root])
     linear = []
     while queue:
-        node = queue.pop(0)
+        node = queue.popleft()
         linear.append(node)
         if node in graph:
             for child in graph[node]:
@@ -95,6 +97,39 @@ def linearise_tree(graph: dict, root: int) -> list:
     return linear
 
 
+def track_time_extents(data: np.ndarray) -> tuple:
+    """Find the first and last time point of every track in the track data.
+
+    Rather than searching the whole of the data for each track, the data are
+    sorted once by track ID and time, so that the first and last time point
+    of each track are at the boundaries of each contiguous block of rows.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        The track data from a napari.Tracks layer, with the track ID in the
+        first column and the time in the second column.
+
+
+    Returns
+    -------
+    track_ids : np.ndarray
+        The sorted, unique track IDs.
+    t_start : np.ndarray
+        The first time point of each track.
+    t_end : np.ndarray
+        The last time point of each track.
+    """
+    order = np.lexsort((data[:, 1], data[:, 0]))
+    sorted_ids = data[order, 0]
+    sorted_t = data[order, 1]
+
+    starts = np.flatnonzero(np.diff(sorted_ids, prepend=np.nan))
+    ends = np.flatnonzero(np.diff(sorted_ids, append=np.nan))
+
+    return sorted_ids[starts], sorted_t[starts], sorted_t[ends]
+
+
 def build_subgraph(layer, node):
     """Build a subgraph containing the node.
 
@@ -119,12 +154,16 @@ def build_subgraph(layer, node):
         The nodes of the subtree that contain the search node.
     """
     roots, reverse_graph = build_reverse_graph(layer.graph)
-    linear_trees = [linearise_tree(reverse_graph, root) for root in roots]
 
-    root_id = None
-    for root, tree in zip(roots, linear_trees):
-        if node in tree:
-            root_id = root
+    # map every node to the root of its tree, so that finding the tree is a
+    # single lookup. If a node belongs to more than one tree, the last
+    # (highest ID) root wins
+    tree_roots = {}
+    for root in roots:
+        for tree_node in linearise_tree(reverse_graph, root):
+            tree_roots[tree_node] = root
+
+    root_id = tree_roots.get(node)
 
     # if we did not find a root node, return None
     if root_id is None:
@@ -135,8 +174,6 @@ def build_subgraph(layer, node):
         node = TreeNode()
         node.ID = _id
 
-        idx = np.where(layer.data[:, 0] == _id)[0]
-        node.t = (np.min(layer.data[idx, 1]), np.max(layer.data[idx, 1]))
         if _id in reverse_graph:
             node.children = reverse_graph[_id]
         node.generation = 1
@@ -145,21 +182,31 @@ def build_subgraph(layer, node):
 
     # now build the treenode objects
     nodes = [_node_from_graph(root_id)]
-    marked = [root_id]
+    marked = {root_id}
 
-    queue = [nodes[0]]
+    queue = deque([nodes[0]])
 
     # breadth first search
     while queue:
-        node = queue.pop(0)
+        node = queue.popleft()
         for child in node.children:
             if child not in marked:
-                marked.append(child)
+                marked.add(child)
                 child_node = _node_from_graph(child)
                 child_node.generation = node.generation + 1
                 queue.append(child_node)
                 nodes.append(child_node)
 
+    # select the rows of the subtree tracks in a single pass over the data,
+    # so that only this small subset needs to be sorted to find the extents
+    subtree_ids = [n.ID for n in nodes]
+    subtree_data = layer.data[np.isin(layer.data[:, 0], subtree_ids)]
+    track_ids, t_start, t_end = track_time_extents(subtree_data)
+
+    for n in nodes:
+        idx = np.searchsorted(track_ids, n.ID)
+        n.t = (t_start[idx], t_end[idx])
+
     return root_id, nodes
 
 
@@ -10,7 +10,10 @@
 # Created:  01/05/2020
 # ------------------------------------------------------------------------------
 
+from collections import OrderedDict
+
 import napari
+import numpy as np
 import pyqtgraph as pg
 from qtpy.QtCore import Qt
 from qtpy.QtWidgets import QVBoxLayout, QWidget
@@ -18,6 +21,15 @@ from qtpy.QtWidgets import QVBoxLayout, QWidget
 from .graph import build_subgraph, layout_subgraph
 
 GUI_MAXIMUM_WIDTH = 600
+LAYOUT_CACHE_SIZE = 32
+
+
+def _edges_to_path(coords):
+    """Flatten a list of edges into a single path, with a NaN after each
+    edge to break the line."""
+    path = np.full((len(coords), 3), np.nan)
+    path[:, :2] = coords
+    return path.ravel()
 
 
 class Arboretum(QWidget):
@@ -55,8 +67,26 @@ class Arboretum(QWidget):
         self.setMaximumWidth(GUI_MAXIMUM_WIDTH)
         self.setLayout(layout)
 
-        # hook up an event to find Tracks layers if the layer list changes
+        # hook up events to find Tracks layers if the layer list changes
         self._viewer.layers.events.changed.connect(self._get_tracks_layers)
+        self._viewer.layers.events.inserted.connect(self._get_tracks_layers)
+        self._viewer.layers.events.removed.connect(self._get_tracks_layers)
+
+        # store pools of edge curves and text items, which are reused between
+        # redraws rather than recreated
+        self._edge_pool = []
+        self._text_pool = []
+
+        # cache the pens used to draw edges, keyed by color
+        self._pens = {}
+
+        # the layer ID and track of the tree currently drawn
+        self._selected = None
+
+        # cache the tree layouts, since these depend only on the layer data
+        # and not on the view, e.g. when selecting a previous track again. The
+        # layers are keyed by ID, so that the cache does not keep them alive
+        self._layouts = OrderedDict()
 
         # store the tracks layers
         self._tracks_layers = []
@@ -75,11 +105,33 @@ class Arboretum(QWidget):
             if layer not in self._tracks_layers:
                 self._append_mouse_callback(layer)
 
+        # drop the cached layouts of removed layers, since the ID of a removed
+        # layer may be reused by a new one
+        for layer in self._tracks_layers:
+            if layer not in layers:
+                self._clear_layouts(id(layer))
+
         self._tracks_layers = layers
 
+    def _clear_layouts(self, layer_id: int):
+        """Clear the cached layouts of a layer, e.g. if its data changes."""
+        for key in [k for k in self._layouts if k[0] == layer_id]:
+            del self._layouts[key]
+
+        # the tree currently drawn is also stale, so allow it to be redrawn
+        if self._selected is not None and self._selected[0] == layer_id:
+            self._selected = None
+
     def _append_mouse_callback(self, layer: napari.layers.Tracks):
         """Append a mouse callback to each Tracks layer."""
 
+        # the layouts are stale if the track data or graph of the layer change
+        layer_id = id(layer)
+        layer.events.data.connect(lambda event: self._clear_layouts(layer_id))
+        layer.events.rebuild_graph.connect(
+            lambda event: self._clear_layouts(layer_id)
+        )
+
         @layer.mouse_drag_callbacks.append
         def show_tree(layer, event):
 
@@ -89,46 +141,124 @@ class Arboretum(QWidget):
             # fix to return the track ID using the world coordinates returned
             # by `viewer.cursor.position`
             track_id = layer.get_value(cursor_position, world=True)
-            root, subgraph_nodes = build_subgraph(layer, track_id)
 
-            if not subgraph_nodes:
-                print(track_id, root, subgraph_nodes)
+            # skip redrawing if the track is already shown
+            selected = (id(layer), track_id)
+            if selected == self._selected:
+                return
+
+            root, edges, annotations = self._layout(layer, track_id)
+
+            if not edges:
+                print(track_id, root, edges)
                 return
 
-            edges, annotations = layout_subgraph(root, subgraph_nodes)
             self.draw_graph(track_id, edges, annotations)
+            self._selected = selected
+
+    def _layout(self, layer, track_id):
+        """Build and layout the subgraph containing the track.
+
+        The layouts are cached, keyed by the layer and track, and cleared when
+        the layer is removed or its data or graph change.
+        """
+        key = (id(layer), track_id)
+        if key in self._layouts:
+            self._layouts.move_to_end(key)
+            return self._layouts[key]
+
+        root, subgraph_nodes = build_subgraph(layer, track_id)
+
+        if not subgraph_nodes:
+            layout = root, [], []
+        else:
+            layout = (root, *layout_subgraph(root, subgraph_nodes))
+
+        self._layouts[key] = layout
+        if len(self._layouts) > LAYOUT_CACHE_SIZE:
+            self._layouts.popitem(last=False)
+
+        return layout
 
     def draw_graph(self, track_id, edges, annotations):
         """Plot graph on the plugin canvas."""
 
-        self.plot_view.clear()
         self.plot_view.setTitle(f"Lineage tree: {track_id}")
 
         # NOTE(arl): disabling the autoranging improves perfomance dramatically
         # https://stackoverflow.com/questions/17103698/plotting-large-arrays-in-pyqtgraph
         self.plot_view.disableAutoRange()
 
+        # batch the edges by color, separating each edge with a NaN, so that
+        # a single plot item is created per color rather than per edge
+        batches = {}
         for ex, ey, ec in edges:
-            self.plot_view.plot(ex, ey, pen=pg.mkPen(color=ec, width=3))
-
-        # labels
-        for tx, ty, tstr, tcol in annotations:
+            key = ec if isinstance(ec, str) else tuple(ec)
+            batch = batches.setdefault(key, ([], []))
+            batch[0].append(ex)
+            batch[1].append(ey)
+
+        batch_x, batch_y = [], []
+        for i, (color, (ex, ey)) in enumerate(batches.items()):
+            if color not in self._pens:
+                self._pens[color] = pg.mkPen(color=color, width=3)
+
+            bx = _edges_to_path(ex)
+            by = _edges_to_path(ey)
+
+            if i < len(self._edge_pool):
+                curve = self._edge_pool[i]
+                curve.setData(bx, by, connect="finite", pen=self._pens[color])
+                curve.setVisible(True)
+            else:
+                curve = pg.PlotCurveItem(
+                    bx, by, connect="finite", pen=self._pens[color]
+                )
+                self.plot_view.addItem(curve)
+                self._edge_pool.append(curve)
+
+            batch_x.append(bx)
+            batch_y.append(by)
+
+        # hide any edge curves that are not needed for this tree
+        for curve in self._edge_pool[len(batches) :]:
+            curve.setVisible(False)
+
+        # labels, reusing the text items from previous redraws where possible
+        for i, (tx, ty, tstr, tcol) in enumerate(annotations):
 
             # change the alpha value according to whether this is the selected
             # cell or another part of the tree
             tcol[3] = 255 if tstr == str(track_id) else 64
 
-            pt = pg.TextItem(
-                text=tstr,
-                color=tcol,
-                html=None,
-                anchor=(0, 0),
-                border=None,
-                fill=None,
-                angle=0,
-                rotateAxis=None,
-            )
+            if i < len(self._text_pool):
+                pt = self._text_pool[i]
+                pt.setText(tstr, color=tcol)
+                pt.setVisible(True)
+            else:
+                pt = pg.TextItem(
+                    text=tstr,
+                    color=tcol,
+                    html=None,
+                    anchor=(0, 0),
+                    border=None,
+                    fill=None,
+                    angle=0,
+                    rotateAxis=None,
+                )
+                self.plot_view.addItem(pt, ignoreBounds=True)
+                self._text_pool.append(pt)
             pt.setPos(tx, ty)
-            self.plot_view.addItem(pt, ignoreBounds=True)
 
-        self.plot_view.autoRange()
+        # hide any text items that are not needed for this tree
+        for pt in self._text_pool[len(annotations) :]:
+            pt.setVisible(False)
+
+        # set the view range from the extent of the edges, rather than using
+        # autoRange, which queries the bounds of every item in the plot
+        xs = np.concatenate(batch_x)
+        ys = np.concatenate(batch_y)
+        self.plot_view.setRange(
+            xRange=(np.nanmin(xs), np.nanmax(xs)),
+            yRange=(np.nanmin(ys), np.nanmax(ys)),
+        )
@@ -1,3 +1,6 @@
+from collections import deque
+from functools import lru_cache
+
 import numpy as np
 from napari.utils.colormaps import AVAILABLE_COLORMAPS
 
@@ -7,6 +10,19 @@ WHITE = np.array([255, 255, 255, 255], dtype=np.uint8)
 RED = np.array([255, 0, 0, 255], dtype=np.uint8)
 
 
+@lru_cache(maxsize=None)
+def _generation_colors(max_generational_depth):
+    """Map the color of each generation of a tree, as RGBA uint8 values.
+
+    The colors only depend on the depth of the tree, so the table is cached
+    and the colormap evaluated once for each depth.
+    """
+    depth = np.arange(max_generational_depth + 1) / max_generational_depth
+    colors = (turbo.map(depth) * 255).astype(np.uint8)
+    colors.setflags(write=False)
+    return colors
+
+
 def _build_tree(nodes):
     """Build and layout the edges of a lineage tree, given the graph nodes.
 
@@ -26,15 +42,26 @@ def _build_tree(nodes):
 
     """
 
-    max_generational_depth = max([n.generation for n in nodes])
+    max_generational_depth = max(n.generation for n in nodes)
+
+    # look up the index of the nodes by ID, rather than searching the list of
+    # nodes, the index is also used to mark the nodes that have been visited
+    node_index = {n.ID: i for i, n in enumerate(nodes)}
+
+    # format the labels once, since each node may be annotated more than once
+    labels = {n.ID: str(n.ID) for n in nodes}
+
+    # TODO(arl): sync this with layer coloring
+    generation_colors = _generation_colors(max_generational_depth)
 
     # put the start vertex into the queue, and the marked list
 
     root = nodes[0]
 
-    queue = [root]
-    marked = [root]
-    y_pos = [0]
+    queue = deque([root])
+    marked = np.zeros(len(nodes), dtype=bool)
+    marked[0] = True
+    y_pos = deque([0])
 
     # store the line coordinates that need to be plotted
     edges = []
@@ -44,36 +71,35 @@ def _build_tree(nodes):
     while queue:
 
         # pop the root from the tree
-        node = queue.pop(0)
-        y = y_pos.pop(0)
+        node = queue.popleft()
+        y = y_pos.popleft()
 
-        # TODO(arl): sync this with layer coloring
-        depth = float(node.generation) / max_generational_depth
-        edge_color = turbo.map(depth)[0] * 255
+        edge_color = generation_colors[node.generation]
 
         # draw the root of the tree
         edges.append(([y, y], [node.t[0], node.t[-1]], edge_color))
 
         # mark if this is an apoptotic tree
         if node.is_leaf:
-            annotations.append((y, node.t[-1], str(node.ID), WHITE))
+            annotations.append((y, node.t[-1], labels[node.ID], WHITE))
 
         if node.is_root:
-            annotations.append((y, node.t[0], str(node.ID), WHITE))
+            annotations.append((y, node.t[0], labels[node.ID], WHITE))
 
-        children = [t for t in nodes if t.ID in node.children]
+        children = [node_index[c] for c in node.children if c in node_index]
 
-        for child in children:
-            if child not in marked:
+        for i, idx in enumerate(children):
+            if not marked[idx]:
 
                 # mark the children
-                marked.append(child)
+                marked[idx] = True
+                child = nodes[idx]
                 queue.append(child)
 
                 # calculate the depth modifier
                 depth_mod = 2.0 / (2.0 ** (node.generation))
 
-                if child == children[0]:
+                if i == 0:
                     y_pos.append(y + depth_mod)
                 else:
                     y_pos.append(y - depth_mod)
@@ -84,19 +110,9 @@ def _build_tree(nodes):
                     (
                         y_pos[-1],
                         child.t[-1] - (child.t[-1] - child.t[0]) / 2.0,
-                        str(child.ID),
+                        labels[child.ID],
                         WHITE,
                     )
                 )
 
-    # now that we have traversed the tree, calculate the span
-    tree_span = []
-    for edge in edges:
-        tree_span.append(edge[0][0])
-        tree_span.append(edge[0][1])
-
-    # # work out the span of the tree, we can modify positioning here
-    # min_x = min(tree_span)
-    # max_x = max(tree_span)
-
     return edges, annotations